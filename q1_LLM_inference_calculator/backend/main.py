@@ -2,18 +2,16 @@ from fastapi import FastAPI, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse
 from typing import Optional, Dict, List, Literal
 from pydantic import BaseModel
-from PIL import Image
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 import requests
 from io import BytesIO
 from fastapi.middleware.cors import CORSMiddleware
 import math
+import time
 from enum import Enum
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 app = FastAPI()
 # ✅ Add CORS middleware
@@ -109,13 +107,38 @@ def calculate_inference_metrics(request: InferenceRequest) -> InferenceMetrics:
         hardware_compatibility=compatibility
     )
 
-vision_model = genai.GenerativeModel("gemini-2.0-flash")
-text_model = genai.GenerativeModel("gemini-2.0-flash")
+# Gemini models are built on first use (or by the startup warm-up) so that
+# importing this module doesn't pay for the SDK import and client setup.
+_models: Dict[str, object] = {}
+
+def get_model(kind: str = "text"):
+    """Return the Gemini model for `kind` ("text" or "vision"), creating it lazily."""
+    if kind not in _models:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _models[kind] = genai.GenerativeModel("gemini-2.0-flash")
+    return _models[kind]
+
+@app.on_event("startup")
+async def warm_up_models():
+    """Build the Gemini clients once the worker is up, off the import path."""
+    start = time.perf_counter()
+    try:
+        get_model("text")
+        get_model("vision")
+        print(f"Gemini models ready in {time.perf_counter() - start:.3f}s")
+    except Exception as e:
+        print(f"Warning: Gemini warm-up failed: {str(e)}")
+
+def open_image(data: bytes):
+    """Decode image bytes; PIL is only imported once an image actually arrives."""
+    from PIL import Image
+    return Image.open(BytesIO(data))
 
 def load_image_from_url(url: str):
     try:
         response = requests.get(url)
-        return Image.open(BytesIO(response.content))
+        return open_image(response.content)
     except Exception as e:
         return None
 
@@ -127,15 +150,15 @@ async def ask_question(
 ):
     img = None
     if image:
-        img = Image.open(BytesIO(await image.read()))
+        img = open_image(await image.read())
     elif image_url:
         img = load_image_from_url(image_url)
 
     try:
         if img:
-            response = vision_model.generate_content([question, img])
+            response = get_model("vision").generate_content([question, img])
         else:
-            response = text_model.generate_content(question)
+            response = get_model("text").generate_content(question)
 
         return JSONResponse(content={
             "answer": response.text,
@@ -1,33 +1,110 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 from dotenv import load_dotenv
-import google.generativeai as genai
+from functools import lru_cache
+import hashlib
 import json
 import os
+import tempfile
+import time
+from shared_store import SharedStore
+from upstream_scheduler import UpstreamScheduler, SchedulerOverloaded, RequestDropped, PRIORITIES, INTERACTIVE
+
+# Load environment variables before any settings below are read
+load_dotenv()
 
 # Load agents knowledge base from JSON file
+@lru_cache(maxsize=None)
 def load_agents_knowledge():
     file_path = os.path.join(os.path.dirname(__file__), 'agentdb.json')
     with open(file_path, 'r') as f:
         return json.load(f)
 
-AGENTS_KNOWLEDGE = load_agents_knowledge()
+# Points per match
+DEFAULT_WEIGHTS = {
+    "language": 3.0,   # task language is supported
+    "complexity": 2.0, # multiplied by COMPLEXITY_BONUS
+    "feature": 1.5,    # per recommended feature matching any agent strength
+    "task_type": 2.0,  # task type matches any of the agent's best_for
+}
+COMPLEXITY_BONUS = {"low": 0.5, "medium": 1.0, "high": 1.5}
 
-# Load environment variables
-load_dotenv()
+# Random tie-breaker added to every score
+DEFAULT_JITTER = 0.5
+
+# Scoring weights, e.g. AGENT_SCORE_WEIGHTS='{"language": 4.0}'
+SCORING_WEIGHTS = {**DEFAULT_WEIGHTS, **json.loads(os.getenv("AGENT_SCORE_WEIGHTS", "{}"))}
+
+@lru_cache(maxsize=None)
+def get_agent_scorer():
+    """Catalog feature matrices, built once from agentdb.json"""
+    # numpy is imported here rather than at module level to keep cold start flat
+    from scoring import AgentScorer
+    return AgentScorer(load_agents_knowledge(), SCORING_WEIGHTS, COMPLEXITY_BONUS, DEFAULT_JITTER)
+
+# Configure Gemini API on first use so importing the app stays cheap
+_model_state = {"initialized": False, "model": None}
+
+def get_model():
+    """Return the Gemini model, importing the SDK and building it on first call."""
+    if not _model_state["initialized"]:
+        _model_state["initialized"] = True
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _model_state["model"] = genai.GenerativeModel('gemini-2.0-flash')
+        except Exception as e:
+            print(f"Warning: Failed to initialize Gemini API: {str(e)}")
+    return _model_state["model"]
 
-# Configure Gemini API
-try:
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-2.0-flash')
-except Exception as e:
-    print(f"Warning: Failed to initialize Gemini API: {str(e)}")
-    model = None
+# Cache and rate-limit state shared by every worker process (see serve.py)
+store = SharedStore(
+    os.getenv("SHARED_STORE_PATH", os.path.join(tempfile.gettempdir(), "agent_recommender_store.sqlite3")),
+    int(os.getenv("CACHE_TTL_SECONDS", 3600)),
+)
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", 0))  # 0 disables the limit
+
+# When set, every /recommend call is appended to this JSONL file for replay_benchmark.py
+TRACE_CAPTURE_PATH = os.getenv("TRACE_CAPTURE_PATH")
+
+def capture_trace(task: "TaskRequest", gemini_analysis: dict, recommendations: List[dict]):
+    """Record the request, the Gemini analysis and the ranking we returned."""
+    if not TRACE_CAPTURE_PATH:
+        return
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "task": task.model_dump(),
+        "gemini_analysis": gemini_analysis,
+        "recommendations": [{"id": r["id"], "score": r["score"]} for r in recommendations],
+    }
+    try:
+        # One short append per line, so concurrent workers don't interleave records
+        with open(TRACE_CAPTURE_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Warning: Failed to capture trace: {str(e)}")
+
+# Queue for Gemini calls made by this worker
+scheduler = UpstreamScheduler(
+    int(os.getenv("UPSTREAM_CONCURRENCY", 4)),
+    float(os.getenv("UPSTREAM_LATENCY_BUDGET", 10.0)),
+)
+UPSTREAM_REQUEST_TIMEOUT = float(os.getenv("UPSTREAM_REQUEST_TIMEOUT", 60.0))
 
 app = FastAPI()
 
+@app.on_event("startup")
+async def warm_up():
+    """Load the agent catalog and Gemini client once the worker has started."""
+    start = time.perf_counter()
+    get_agent_scorer()
+    get_model()
+    print(f"Startup warm-up finished in {time.perf_counter() - start:.3f}s")
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -53,10 +130,27 @@ class AgentRecommendation(BaseModel):
 async def root():
     return {"message": "AI Coding Agent Recommendation System"}
 
-async def analyze_task_with_gemini(task_description: str, language: str, complexity: str) -> dict:
-    """Analyze the task using Gemini API to determine the best agent fit."""
+async def analyze_task_with_gemini(
+    task_description: str,
+    language: str,
+    complexity: str,
+    request: Optional[Request] = None,
+) -> dict:
+    """Analyze the task using Gemini API to determine the best agent fit.
+
+    The Gemini call goes through the upstream scheduler; pass the incoming
+    `request` so it can be prioritized and dropped if the client disconnects.
+    """
+    model = get_model()
     if not model:
         return {}
+    
+    cache_key = "analysis:" + hashlib.sha256(
+        f"{task_description}\0{language}\0{complexity}".encode("utf-8")
+    ).hexdigest()
+    cached = await run_in_threadpool(store.get, cache_key)
+    if cached:
+        return cached
         
     prompt = f"""Analyze the following coding task and determine the most suitable type of AI coding assistant.
     
@@ -79,7 +173,20 @@ async def analyze_task_with_gemini(task_description: str, language: str, complex
     """
     
     try:
-        response = await model.generate_content_async(prompt)
+        if request is not None:
+            client = request.client.host if request.client else "unknown"
+            priority = PRIORITIES.get(request.headers.get("X-Request-Priority", "").lower(), INTERACTIVE)
+            is_disconnected = request.is_disconnected
+        else:
+            client, priority, is_disconnected = "internal", INTERACTIVE, None
+        response = await scheduler.submit(
+            cache_key,
+            lambda: model.generate_content_async(prompt),
+            client=client,
+            priority=priority,
+            is_disconnected=is_disconnected,
+            deadline=time.monotonic() + UPSTREAM_REQUEST_TIMEOUT,
+        )
         # Extract JSON from the response
         import json
         import re
@@ -87,27 +194,31 @@ async def analyze_task_with_gemini(task_description: str, language: str, complex
         # Try to find JSON in the response
         json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
         if json_match:
-            return json.loads(json_match.group(0))
+            analysis = json.loads(json_match.group(0))
+            await run_in_threadpool(store.set, cache_key, analysis)
+            return analysis
         return {}
+    except (SchedulerOverloaded, RequestDropped):
+        raise
     except Exception as e:
         print(f"Error analyzing task with Gemini: {str(e)}")
         return {}
 
 def calculate_agent_score(agent: Dict[str, Any], task: TaskRequest, gemini_analysis: dict) -> float:
-    """Calculate a score for how well an agent matches the task requirements."""
+    """Calculate a score for how well an agent matches the task requirements.
+
+    Per-agent reference implementation; /recommend scores the whole catalog
+    at once with AgentScorer, which applies the same rules.
+    """
     score = 0.0
     
     # Base score for language support
     if task.language and task.language.lower() in [lang.lower() for lang in agent["languages"]]:
-        score += 3.0
+        score += SCORING_WEIGHTS["language"]
     
     # Complexity bonus
-    complexity_bonus = {
-        "low": 0.5,
-        "medium": 1.0,
-        "high": 1.5
-    }.get(task.complexity.lower(), 1.0)
-    score += 2.0 * complexity_bonus
+    complexity_bonus = COMPLEXITY_BONUS.get(task.complexity.lower(), 1.0)
+    score += SCORING_WEIGHTS["complexity"] * complexity_bonus
     
     # Gemini analysis scoring
     if gemini_analysis:
@@ -117,18 +228,18 @@ def calculate_agent_score(agent: Dict[str, Any], task: TaskRequest, gemini_analy
         
         for feature in required_features:
             if any(word in feature.lower() for word in agent_strengths):
-                score += 1.5
+                score += SCORING_WEIGHTS["feature"]
         
         # Check if agent is good for the task type
         task_type = gemini_analysis.get("task_type", "").lower()
         best_for = [bf.lower() for bf in agent["best_for"]]
         
         if any(bf in task_type for bf in best_for):
-            score += 2.0
+            score += SCORING_WEIGHTS["task_type"]
     
     # Add some randomness to avoid ties
     import random
-    score += random.uniform(0, 0.5)
+    score += random.uniform(0, DEFAULT_JITTER)
     
     return round(score, 2)
 
@@ -170,33 +281,55 @@ def generate_explanation(agent: Dict[str, Any], task: TaskRequest, gemini_analys
     return f"Recommended because it {', '.join(reasons)}."
 
 @app.post("/recommend", response_model=List[AgentRecommendation])
-async def recommend_agents(task: TaskRequest):
+async def recommend_agents(task: TaskRequest, request: Request):
     """Get recommendations for the best coding agents for a given task."""
+    client = request.client.host if request.client else "unknown"
+    allowed, retry_after = True, 0
+    if RATE_LIMIT_PER_MINUTE > 0:
+        allowed, retry_after = await run_in_threadpool(
+            store.hit_rate_limit, f"recommend:{client}", RATE_LIMIT_PER_MINUTE
+        )
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(retry_after)},
+        )
+    
     # Analyze task with Gemini
-    gemini_analysis = await analyze_task_with_gemini(
-        task.description,
-        task.language,
-        task.complexity
-    )
+    try:
+        gemini_analysis = await analyze_task_with_gemini(
+            task.description,
+            task.language,
+            task.complexity,
+            request,
+        )
+    except SchedulerOverloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except RequestDropped:
+        raise HTTPException(status_code=503, detail="Request expired before it could be processed")
     print(gemini_analysis,"gemini_analysis")
     
-    # Calculate scores for all agents
-    scored_agents = []
-
-    for agent in AGENTS_KNOWLEDGE:
-        score = calculate_agent_score(agent, task, gemini_analysis)
-        explanation = generate_explanation(agent, task, gemini_analysis)
-        
-        scored_agents.append({
+    # Score all agents at once, then explain only the ones we return
+    agents = load_agents_knowledge()
+    scores = get_agent_scorer().score(task.language, task.complexity, gemini_analysis)
+    top_indices = sorted(range(len(scores)), key=lambda i: -scores[i])[:3]
+    
+    top_agents = []
+    for i in top_indices:
+        agent = agents[i]
+        score = float(scores[i])
+        top_agents.append({
             **agent,
             "score": score,
-            "explanation": explanation,
+            "explanation": generate_explanation(agent, task, gemini_analysis),
             "analysis": gemini_analysis if score > 0 else None  # Include analysis for top agents
         })
     
-    # Sort by score (descending) and get top 3
-    top_agents = sorted(scored_agents, key=lambda x: x["score"], reverse=True)[:3]
-    
     # Format response
     recommendations = []
     for agent in top_agents:
@@ -208,4 +341,5 @@ async def recommend_agents(task: TaskRequest):
             "analysis": agent.get("analysis")
         })
     
+    capture_trace(task, gemini_analysis, recommendations)
     return recommendations
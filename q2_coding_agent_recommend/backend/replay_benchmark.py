@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark for the recommendation engine.
+
+Replays traces captured with TRACE_CAPTURE_PATH through the scoring,
+explanation and /recommend code paths with Gemini stubbed by the recorded
+analysis, and reports per-stage timings, tracemalloc allocations,
+throughput and ranking differences against a saved baseline.
+
+    TRACE_CAPTURE_PATH=traces.jsonl uvicorn main:app     # capture
+    python replay_benchmark.py traces.jsonl --save-baseline baseline.json
+    # ...change scoring/caching...
+    python replay_benchmark.py traces.jsonl --baseline baseline.json
+
+Exits with status 1 if any top-3 ranking differs from the baseline, or if
+calculate_agent_score and AgentScorer rank any trace differently.
+Tie-breaking jitter is disabled so rankings are deterministic.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+# Keep the replay away from the live store and rate limits; set before importing main
+os.environ["RATE_LIMIT_PER_MINUTE"] = "0"
+os.environ.setdefault("SHARED_STORE_PATH", os.path.join(tempfile.mkdtemp(), "replay_store.sqlite3"))
+os.environ.pop("TRACE_CAPTURE_PATH", None)
+
+import main  # noqa: E402
+from scoring import AgentScorer  # noqa: E402
+
+
+def load_traces(path):
+    traces = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record["task"] = main.TaskRequest(**record["task"])
+                record["gemini_analysis"] = record.get("gemini_analysis") or {}
+                traces.append(record)
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Skipping line {line_number}: {e}")
+    return traces
+
+
+def trace_key(trace):
+    task = trace["task"]
+    return f"{task.description}\0{task.language}\0{task.complexity}"
+
+
+def install_stubs(traces):
+    """Serve recorded analyses instead of calling Gemini, and make scoring deterministic."""
+    recorded = {trace_key(trace): trace.get("gemini_analysis") or {} for trace in traces}
+
+    async def recorded_analysis(task_description, language, complexity, request=None):
+        return recorded.get(f"{task_description}\0{language}\0{complexity}", {})
+
+    main.analyze_task_with_gemini = recorded_analysis
+    main.DEFAULT_JITTER = 0
+    scorer = AgentScorer(main.load_agents_knowledge(), main.SCORING_WEIGHTS, main.COMPLEXITY_BONUS, jitter=0)
+    main.get_agent_scorer = lambda: scorer
+    return scorer
+
+
+def build_stages(scorer):
+    agents = main.load_agents_knowledge()
+    request = SimpleNamespace(client=None, headers={})
+    loop = asyncio.new_event_loop()
+
+    def score_scalar(trace):
+        for agent in agents:
+            main.calculate_agent_score(agent, trace["task"], trace["gemini_analysis"])
+
+    def score_vectorized(trace):
+        task = trace["task"]
+        scorer.score(task.language, task.complexity, trace["gemini_analysis"])
+
+    def explain(trace):
+        for agent in agents:
+            main.generate_explanation(agent, trace["task"], trace["gemini_analysis"])
+
+    def recommend(trace):
+        # recommend_agents prints the analysis; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            return loop.run_until_complete(main.recommend_agents(trace["task"], request))
+
+    return {
+        "score_scalar": score_scalar,
+        "score_vectorized": score_vectorized,
+        "explain": explain,
+        "recommend": recommend,
+    }
+
+
+def run_stage(fn, traces, repeat):
+    """Time one stage over every trace, then re-run it under tracemalloc."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for trace in traces:
+            fn(trace)
+    elapsed = time.perf_counter() - start
+    calls = repeat * len(traces)
+
+    tracemalloc.start()
+    for trace in traces:
+        fn(trace)
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+
+    return {
+        "calls": calls,
+        "total_seconds": round(elapsed, 6),
+        "mean_us": round(elapsed / calls * 1e6, 2) if calls else 0.0,
+        "throughput_per_second": round(calls / elapsed, 1) if elapsed else 0.0,
+        "peak_kib": round(peak / 1024, 1),
+        "retained_kib": round(current / 1024, 1),
+        "retained_blocks": blocks,
+    }
+
+
+def rank(stages, traces):
+    return [[r["id"] for r in stages["recommend"](trace)] for trace in traces]
+
+
+def top3(agents, scores):
+    order = sorted(range(len(scores)), key=lambda i: -scores[i])[:3]
+    return [agents[i]["id"] for i in order]
+
+
+def scorer_rankings(scorer, traces):
+    """Top-3 per trace from calculate_agent_score and from AgentScorer."""
+    agents = main.load_agents_knowledge()
+    scalar, vectorized = [], []
+    for trace in traces:
+        task, analysis = trace["task"], trace["gemini_analysis"]
+        scalar.append(top3(agents, [main.calculate_agent_score(agent, task, analysis) for agent in agents]))
+        vectorized.append(top3(agents, scorer.score(task.language, task.complexity, analysis)))
+    return scalar, vectorized
+
+
+def print_report(results, baseline):
+    print(f"{'stage':<18}{'mean us':>12}{'per sec':>12}{'peak KiB':>11}{'kept KiB':>11}{'vs base':>10}")
+    for name, stats in results["stages"].items():
+        change = ""
+        base = (baseline or {}).get("stages", {}).get(name)
+        if base and base["mean_us"]:
+            change = f"{(stats['mean_us'] - base['mean_us']) / base['mean_us'] * 100:+.1f}%"
+        print(
+            f"{name:<18}{stats['mean_us']:>12.2f}{stats['throughput_per_second']:>12.1f}"
+            f"{stats['peak_kib']:>11.1f}{stats['retained_kib']:>11.1f}{change:>10}"
+        )
+
+
+def diff_rankings(traces, rankings, reference, label):
+    """Print traces whose top-3 differs from `reference`; return the count."""
+    differences = 0
+    for trace, ranking, expected in zip(traces, rankings, reference):
+        if expected is not None and ranking != expected:
+            differences += 1
+            if differences <= 10:
+                print(f"  {trace['task'].description[:60]!r}: {expected} -> {ranking}")
+    print(f"Ranking differences vs {label}: {differences}/{len(traces)}")
+    return differences
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Replay captured /recommend traces offline")
+    parser.add_argument("traces", help="JSONL file written with TRACE_CAPTURE_PATH")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the traces per stage")
+    parser.add_argument("--baseline", help="Baseline JSON to compare timings and rankings against")
+    parser.add_argument("--save-baseline", help="Write this run's timings and rankings to a JSON file")
+    args = parser.parse_args()
+
+    traces = load_traces(args.traces)
+    if not traces:
+        print("No traces to replay.")
+        sys.exit(1)
+    scorer = install_stubs(traces)
+    stages = build_stages(scorer)
+
+    rankings = rank(stages, traces)  # also warms up every code path
+    results = {
+        "traces": len(traces),
+        "repeat": args.repeat,
+        "stages": {name: run_stage(fn, traces, args.repeat) for name, fn in stages.items()},
+        "trace_keys": [trace_key(trace) for trace in traces],
+        "rankings": rankings,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("trace_keys") != results["trace_keys"]:
+            print("Warning: baseline was recorded from a different trace file")
+
+    print(f"Replayed {len(traces)} traces x {args.repeat} passes against {len(main.load_agents_knowledge())} agents")
+    print_report(results, baseline)
+
+    # Recorded rankings include production's random tie-breaking, so this is informational
+    recorded = [[r["id"] for r in trace.get("recommendations", [])] or None for trace in traces]
+    diff_rankings(traces, rankings, recorded, "captured traffic")
+
+    # Both scorers must agree before any timing comparison between them means anything
+    scalar, vectorized = scorer_rankings(scorer, traces)
+    failed = diff_rankings(traces, vectorized, scalar, "scalar scoring") > 0
+    if baseline:
+        failed = diff_rankings(traces, rankings, baseline.get("rankings", []), "baseline") > 0 or failed
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
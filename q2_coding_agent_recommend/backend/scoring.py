@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class AgentScorer:
+    """Scores every agent in the catalog with matrix products.
+
+    The catalog is encoded once as binary agents x vocabulary matrices for
+    languages, strengths and best_for terms. A task is encoded against the
+    vocabularies (independent of how many agents there are), and all agents
+    are scored at once; score_many scores several tasks with matrix-matrix
+    products. Matches use the same rules as calculate_agent_score, and the
+    weights, complexity bonuses and jitter are the ones defined in main.py.
+    """
+
+    def __init__(
+        self,
+        agents: Sequence[Dict[str, Any]],
+        weights: Dict[str, float],
+        complexity_bonus: Dict[str, float],
+        jitter: float = 0.5,
+        rng: Optional[np.random.Generator] = None,
+    ):
+        self.agents = list(agents)
+        self.weights = dict(weights)
+        self.complexity_bonus = dict(complexity_bonus)
+        self.jitter = jitter
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.languages, self.language_matrix = self._encode_catalog("languages")
+        self.strengths, self.strength_matrix = self._encode_catalog("strengths")
+        self.best_for, self.best_for_matrix = self._encode_catalog("best_for")
+        self._language_index = {term: i for i, term in enumerate(self.languages)}
+
+    def _encode_catalog(self, field: str) -> Tuple[List[str], np.ndarray]:
+        vocabulary = sorted({term.lower() for agent in self.agents for term in agent[field]})
+        index = {term: i for i, term in enumerate(vocabulary)}
+        matrix = np.zeros((len(self.agents), len(vocabulary)), dtype=np.float32)
+        for row, agent in enumerate(self.agents):
+            for term in agent[field]:
+                matrix[row, index[term.lower()]] = 1.0
+        return vocabulary, matrix
+
+    def _contained_terms(self, vocabulary: List[str], text: str) -> np.ndarray:
+        # Original rule is substring containment: `term in text`
+        return np.fromiter((term in text for term in vocabulary), dtype=np.float32, count=len(vocabulary))
+
+    def score_many(self, tasks: Sequence[Tuple[str, str, dict]]) -> np.ndarray:
+        """Score all agents for each (language, complexity, gemini_analysis) task.
+
+        Returns an agents x tasks array of scores rounded to 2 decimals.
+        """
+        n_tasks = len(tasks)
+        languages = np.zeros((n_tasks, len(self.languages)), dtype=np.float32)
+        task_types = np.zeros((n_tasks, len(self.best_for)), dtype=np.float32)
+        complexity = np.zeros(n_tasks, dtype=np.float32)
+        feature_rows = []
+        feature_owner = []
+
+        for t, (language, task_complexity, analysis) in enumerate(tasks):
+            if language and language.lower() in self._language_index:
+                languages[t, self._language_index[language.lower()]] = 1.0
+            complexity[t] = self.complexity_bonus.get((task_complexity or "").lower(), 1.0)
+            if analysis:
+                for feature in analysis.get("recommended_features") or []:
+                    feature_rows.append(self._contained_terms(self.strengths, str(feature).lower()))
+                    feature_owner.append(t)
+                task_types[t] = self._contained_terms(self.best_for, str(analysis.get("task_type") or "").lower())
+
+        language_hits = self.language_matrix @ languages.T
+        task_type_hits = (self.best_for_matrix @ task_types.T) > 0
+        if feature_rows:
+            features = np.stack(feature_rows)
+            owners = np.zeros((len(feature_rows), n_tasks), dtype=np.float32)
+            owners[np.arange(len(feature_rows)), feature_owner] = 1.0
+            # (agents x features) "any strength matched", summed per task
+            feature_hits = ((self.strength_matrix @ features.T) > 0).astype(np.float32) @ owners
+        else:
+            feature_hits = np.zeros((len(self.agents), n_tasks), dtype=np.float32)
+
+        w = self.weights
+        scores = (
+            w["language"] * language_hits
+            + w["complexity"] * complexity[np.newaxis, :]
+            + w["feature"] * feature_hits
+            + w["task_type"] * task_type_hits
+        ).astype(np.float64)
+        if self.jitter:
+            scores += self.rng.uniform(0, self.jitter, size=scores.shape)
+        return np.round(scores, 2)
+
+    def score(self, language: str, complexity: str, analysis: dict) -> np.ndarray:
+        """Scores of all agents (in catalog order) for a single task"""
+        return self.score_many([(language, complexity, analysis)])[:, 0]
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the recommendation API.
+Runs one uvicorn worker per CPU with reload disabled; workers share the
+analysis cache and rate limits through the SQLite store in shared_store.py.
+
+    python serve.py                # WORKERS, HOST, PORT from the environment
+"""
+
+import importlib.util
+import os
+
+import uvicorn
+
+
+def main():
+    workers = int(os.getenv("WORKERS", 0)) or (os.cpu_count() or 1)
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    print(f"Starting recommendation API with {workers} workers (loop={loop}, http={http})")
+
+    # Run from this directory so the "main:app" import string resolves in every worker
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+        workers=workers,
+        reload=False,
+        loop=loop,
+        http=http,
+        # On SIGTERM stop accepting connections and let in-flight Gemini calls finish
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 60)),
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
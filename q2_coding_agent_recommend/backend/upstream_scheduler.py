@@ -0,0 +1,191 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+INTERACTIVE = 0
+BATCH = 1
+
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+
+class SchedulerOverloaded(Exception):
+    """The queue can't start this request within the latency budget"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Upstream queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RequestDropped(Exception):
+    """Every caller waiting on a queued request went away before it started"""
+
+
+class _Job:
+    def __init__(self, key: str, call: Callable[[], Awaitable[Any]], client: str, priority: int):
+        self.key = key
+        self.call = call
+        self.client = client
+        self.priority = priority
+        self.started = False
+        self.future = asyncio.get_running_loop().create_future()
+        # Nobody may be left to read the outcome, so mark it retrieved up front
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        # One (is_disconnected, deadline) pair per caller waiting on this job
+        self.waiters = []
+
+
+class UpstreamScheduler:
+    """Schedules upstream LLM calls for one worker process.
+
+    - Priority classes: interactive requests always start before batch ones.
+    - Fair share: within a class, clients are served round-robin, so one
+      client with many queued requests can't starve the others.
+    - Single-flight: callers submitting the same key while it is queued or
+      running share one upstream call; a queued job joined by a
+      higher-priority caller moves to that caller's queue.
+    - Dropping: a queued request is skipped if all its callers disconnected
+      or passed their deadline.
+    - Admission control: new requests raise SchedulerOverloaded when the
+      estimated queue wait exceeds the latency budget.
+    """
+
+    def __init__(self, concurrency: int = 4, latency_budget: float = 10.0, initial_latency: float = 2.0):
+        self.concurrency = max(1, concurrency)
+        self.latency_budget = latency_budget
+        self._avg_latency = initial_latency
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {INTERACTIVE: OrderedDict(), BATCH: OrderedDict()}
+        self._jobs: Dict[str, _Job] = {}
+        self._running = 0
+        self._counters = {"submitted": 0, "deduplicated": 0, "rejected": 0, "dropped": 0, "completed": 0}
+
+    def _queued(self, up_to_priority: int) -> int:
+        return sum(
+            len(jobs)
+            for priority, clients in self._queues.items()
+            if priority <= up_to_priority
+            for jobs in clients.values()
+        )
+
+    def estimated_wait(self, priority: int = INTERACTIVE) -> float:
+        """Seconds a new request of `priority` would wait before it starts"""
+        ahead = self._running + self._queued(priority)
+        return (ahead // self.concurrency) * self._avg_latency
+
+    async def submit(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Any]],
+        client: str = "anonymous",
+        priority: int = INTERACTIVE,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """Run `call()` through the queue and return its result.
+
+        `deadline` is a time.monotonic() value after which this caller no
+        longer wants the result.
+        """
+        job = self._jobs.get(key)
+        if job is not None:
+            self._counters["deduplicated"] += 1
+            if priority < job.priority and not job.started:
+                self._promote(job, client, priority)
+        else:
+            wait = self.estimated_wait(priority)
+            if wait > self.latency_budget:
+                self._counters["rejected"] += 1
+                raise SchedulerOverloaded(max(1, math.ceil(wait - self.latency_budget)))
+            job = _Job(key, call, client, priority)
+            self._jobs[key] = job
+            self._queues[priority].setdefault(client, deque()).append(job)
+            self._counters["submitted"] += 1
+            self._dispatch()
+
+        waiter = (is_disconnected, deadline)
+        job.waiters.append(waiter)
+        try:
+            # shield: one caller going away must not cancel the shared call
+            return await asyncio.shield(job.future)
+        finally:
+            job.waiters.remove(waiter)
+
+    def _promote(self, job: _Job, client: str, priority: int):
+        """Move a queued job to a higher-priority caller's queue so it doesn't wait behind batch work"""
+        clients = self._queues[job.priority]
+        jobs = clients.get(job.client)
+        if jobs is not None and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del clients[job.client]
+        job.priority = priority
+        job.client = client
+        self._queues[priority].setdefault(client, deque()).append(job)
+
+    def _next_job(self) -> Optional[_Job]:
+        for priority in sorted(self._queues):
+            clients = self._queues[priority]
+            if not clients:
+                continue
+            client, jobs = next(iter(clients.items()))
+            job = jobs.popleft()
+            # Move this client behind the others in its class (round-robin)
+            del clients[client]
+            if jobs:
+                clients[client] = jobs
+            return job
+        return None
+
+    def _dispatch(self):
+        while self._running < self.concurrency:
+            job = self._next_job()
+            if job is None:
+                return
+            job.started = True
+            self._running += 1
+            asyncio.ensure_future(self._run(job))
+
+    async def _abandoned(self, job: _Job) -> bool:
+        now = time.monotonic()
+        for is_disconnected, deadline in list(job.waiters):
+            if deadline is not None and now > deadline:
+                continue
+            try:
+                if is_disconnected is not None and await is_disconnected():
+                    continue
+            except Exception:
+                pass
+            return False
+        return True
+
+    async def _run(self, job: _Job):
+        try:
+            if await self._abandoned(job):
+                self._counters["dropped"] += 1
+                job.future.set_exception(RequestDropped(f"Dropped {job.key}: no caller is waiting"))
+                return
+            start = time.monotonic()
+            try:
+                result = await job.call()
+            except Exception as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            # Exponentially weighted average keeps the wait estimate current
+            self._avg_latency = 0.8 * self._avg_latency + 0.2 * (time.monotonic() - start)
+            self._counters["completed"] += 1
+        finally:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+            self._running -= 1
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "running": self._running,
+            "queued": self._queued(BATCH),
+            "avg_latency_seconds": round(self._avg_latency, 3),
+            "estimated_wait_seconds": round(self.estimated_wait(INTERACTIVE), 3),
+        }
@@ -1,15 +1,18 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import json
-import google.generativeai as genai
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 import re
-from typing import List, Dict, Any
+import hashlib
+from typing import List, Dict, Any, Optional
 
 app = FastAPI(title="Adaptive Prompt Optimizer", version="1.0.0")
 
@@ -30,7 +33,7 @@ templates = Jinja2Templates(directory="templates")
 @app.get("/debug")
 async def debug():
     """Debug endpoint to check if API is working"""
-    return {"status": "ok", "message": "API is working correctly"}
+    return {"status": "ok", "message": "API is working correctly", "scheduler": scheduler.stats()}
 
 @app.get("/test", response_class=HTMLResponse)
 async def test_page(request: Request):
@@ -42,16 +45,37 @@ async def test_page(request: Request):
 
 # Import configuration
 from config import Config
+from tool_registry import ToolRegistry
+from shared_store import SharedStore
+from local_optimizer import analyze_locally, estimate_complexity, optimize_locally
+from upstream_scheduler import UpstreamScheduler, SchedulerOverloaded, RequestDropped, PRIORITIES, INTERACTIVE
 
-# Configure Gemini AI
-genai.configure(api_key=Config.GEMINI_API_KEY)
+# Cache and rate-limit state shared by every worker process
+store = SharedStore(Config.SHARED_STORE_PATH, Config.CACHE_TTL_SECONDS)
 
-print(f"Gemini API configured with key: {'*' * (len(Config.GEMINI_API_KEY) - 4) + Config.GEMINI_API_KEY[-4:] if Config.GEMINI_API_KEY != 'your-api-key-here' else 'NOT SET'}")
+# Queue for Gemini calls made by this worker
+scheduler = UpstreamScheduler(Config.UPSTREAM_CONCURRENCY, Config.UPSTREAM_LATENCY_BUDGET)
+
+# Gemini AI is configured lazily, the first time a model is needed
+_genai = None
+
+def get_genai():
+    """Import and configure the Gemini SDK on first use."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        print(f"Gemini API configured with key: {'*' * (len(Config.GEMINI_API_KEY) - 4) + Config.GEMINI_API_KEY[-4:] if Config.GEMINI_API_KEY != 'your-api-key-here' else 'NOT SET'}")
+        _genai = genai
+    return _genai
 
 # Pydantic models
+OPTIMIZE_MODES = ("llm", "hybrid", "local")
+
 class OptimizeRequest(BaseModel):
     prompt: str
     tool: str
+    mode: Optional[str] = None  # one of OPTIMIZE_MODES; defaults to Config.OPTIMIZE_MODE
 
 class OptimizeResponse(BaseModel):
     original_prompt: str
@@ -59,6 +83,7 @@ class OptimizeResponse(BaseModel):
     tool: str
     analysis: Dict[str, Any]
     optimizations_made: List[str]
+    source: str = "gemini"  # "gemini" or "local"
     timestamp: str
 
 class ToolInfo(BaseModel):
@@ -68,79 +93,73 @@ class ToolInfo(BaseModel):
 
 class PromptOptimizer:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
-        self.supported_tools = {
-            'copilot': {
-                'name': 'GitHub Copilot',
-                'strengths': ['Code completion', 'Function generation', 'Bug fixes'],
-                'best_practices': [
-                    'Use descriptive function names',
-                    'Add type hints and docstrings',
-                    'Be specific about desired functionality',
-                    'Include context about the codebase'
-                ]
-            },
-            'cursor': {
-                'name': 'Cursor AI',
-                'strengths': ['Code editing', 'Refactoring', 'Multi-file operations'],
-                'best_practices': [
-                    'Describe the current state and desired outcome',
-                    'Be explicit about file locations',
-                    'Use clear, actionable language',
-                    'Mention specific technologies/frameworks'
-                ]
-            },
-            'replit': {
-                'name': 'Replit AI',
-                'strengths': ['Full-stack development', 'Interactive coding', 'Deployment'],
-                'best_practices': [
-                    'Specify the programming language',
-                    'Mention deployment requirements',
-                    'Include package/dependency needs',
-                    'Be clear about the project structure'
-                ]
-            },
-            'codewhisperer': {
-                'name': 'Amazon CodeWhisperer',
-                'strengths': ['AWS integration', 'Security-focused code', 'Enterprise patterns'],
-                'best_practices': [
-                    'Mention AWS services if relevant',
-                    'Include security considerations',
-                    'Specify cloud architecture patterns',
-                    'Use enterprise-grade terminology'
-                ]
-            },
-            'tabnine': {
-                'name': 'Tabnine',
-                'strengths': ['Code completion', 'Pattern recognition', 'Team consistency'],
-                'best_practices': [
-                    'Use consistent naming conventions',
-                    'Provide context about team coding style',
-                    'Be specific about patterns to follow',
-                    'Include relevant imports/dependencies'
-                ]
-            },
-            'cody': {
-                'name': 'Sourcegraph Cody',
-                'strengths': ['Code search', 'Large codebase navigation', 'Code understanding'],
-                'best_practices': [
-                    'Reference specific files or functions',
-                    'Use precise technical terminology',
-                    'Include context about codebase structure',
-                    'Mention related code patterns'
-                ]
-            },
-            'claude': {
-                'name': 'Claude (Anthropic)',
-                'strengths': ['Code analysis', 'Architecture design', 'Complex reasoning'],
-                'best_practices': [
-                    'Provide comprehensive context',
-                    'Ask for step-by-step explanations',
-                    'Include architectural constraints',
-                    'Request code review and suggestions'
-                ]
-            }
-        }
+        self._model = None
+        self.registry = ToolRegistry(Config.TOOLS_FILE, Config.TOOLS_RELOAD_INTERVAL)
+        # tool_id -> (prefix_key, model, expires_at, cached_content)
+        self._tool_models = {}
+        self._tool_models_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Gemini model, created on first access rather than at import time"""
+        if self._model is None:
+            self._model = get_genai().GenerativeModel('gemini-2.0-flash')
+        return self._model
+
+    @property
+    def supported_tools(self):
+        return self.registry.tools
+
+    def model_for_tool(self, tool):
+        """Model whose instructions are the tool's precompiled prefix.
+
+        The prefix is normally sent as a system instruction, so it is still
+        sent and billed on every call. With GEMINI_CONTEXT_CACHE enabled it is
+        stored as Gemini cached content instead, but only if it reaches
+        GEMINI_CACHE_MIN_TOKENS. The prefixes built from the shipped tools.json
+        are about 150 tokens, far below that minimum, so caching never applies
+        to them. A failed cache creation is retried after the cache TTL.
+        """
+        # Called from threadpool workers; serialize so one tool never gets two caches
+        with self._tool_models_lock:
+            entry = self._tool_models.get(tool.tool_id)
+            if entry and entry[0] == tool.prefix_key and entry[2] > time.time():
+                return entry[1]
+            if entry and entry[3] is not None:
+                try:
+                    entry[3].delete()
+                except Exception:
+                    pass
+
+            genai = get_genai()
+            model, cached, expires_at = None, None, float('inf')
+            ttl = Config.GEMINI_CACHE_TTL_SECONDS
+            # Rough estimate of ~4 characters per token
+            cacheable = len(tool.prefix) / 4 >= Config.GEMINI_CACHE_MIN_TOKENS
+            if Config.GEMINI_CONTEXT_CACHE and not cacheable:
+                print(f"Prefix for {tool.tool_id} is below GEMINI_CACHE_MIN_TOKENS, using system instruction")
+            elif Config.GEMINI_CONTEXT_CACHE:
+                try:
+                    from google.generativeai import caching
+                    cached = caching.CachedContent.create(
+                        model=Config.GEMINI_CACHE_MODEL,
+                        display_name=f"prompt-optimizer-{tool.tool_id}-{tool.prefix_key}",
+                        system_instruction=tool.prefix,
+                        ttl=timedelta(seconds=ttl),
+                    )
+                    model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+                    # Refresh a little before Gemini expires the cached content
+                    expires_at = time.time() + ttl * 0.9
+                except Exception as e:
+                    print(f"Context cache unavailable for {tool.tool_id}, using system instruction: {e}")
+                    cached = None
+                    # Try caching again later rather than giving up for the life of the process
+                    expires_at = time.time() + ttl
+            if model is None:
+                model = genai.GenerativeModel('gemini-2.0-flash', system_instruction=tool.prefix)
+
+            self._tool_models[tool.tool_id] = (tool.prefix_key, model, expires_at, cached)
+            return model
 
     def analyze_prompt_intent(self, prompt):
         """Analyze the intent and complexity of the input prompt"""
@@ -186,36 +205,20 @@ class PromptOptimizer:
 
     def optimize_for_tool(self, prompt, tool_id, analysis):
         """Generate optimized prompt for specific tool"""
-        if tool_id not in self.supported_tools:
+        tool = self.registry.get(tool_id)
+        if tool is None:
             return prompt, []
 
-        tool_info = self.supported_tools[tool_id]
-        
-        optimization_prompt = f"""
-        Optimize this coding prompt for {tool_info['name']}:
-        
-        Original Prompt: "{prompt}"
-        
-        Tool Strengths: {', '.join(tool_info['strengths'])}
-        Best Practices: {', '.join(tool_info['best_practices'])}
-        
-        Intent Analysis: {json.dumps(analysis, indent=2)}
-        
-        Create an optimized version that:
-        1. Leverages the tool's strengths
-        2. Follows the tool's best practices
-        3. Addresses missing context from the analysis
-        4. Is more specific and actionable
-        
-        Provide:
-        1. optimized_prompt: The improved prompt
-        2. optimizations_made: List of specific changes and why they help
-        
-        Return as JSON only.
-        """
+        try:
+            model = self.model_for_tool(tool)
+            optimization_prompt = tool.render(prompt, analysis)
+        except Exception as e:
+            print(f"Tool model error: {e}")
+            model = None
+            optimization_prompt = tool.full_prompt(prompt, analysis)
         
         try:
-            response = self.model.generate_content(optimization_prompt)
+            response = (model or self.model).generate_content(optimization_prompt)
             json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
             if json_match:
                 result = json.loads(json_match.group())
@@ -247,6 +250,18 @@ except Exception as e:
     optimizer = FallbackOptimizer()
     print("✓ Fallback optimizer initialized")
 
+@app.on_event("startup")
+async def warm_up():
+    """Build the Gemini client after the worker starts instead of at import"""
+    if not isinstance(optimizer, PromptOptimizer):
+        return
+    start = time.perf_counter()
+    try:
+        optimizer.model
+        print(f"✓ Gemini model ready in {time.perf_counter() - start:.3f}s")
+    except Exception as e:
+        print(f"✗ Gemini warm-up failed: {e}")
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     # Make sure to pass the request object as required by Jinja2Templates
@@ -255,31 +270,156 @@ async def read_root(request: Request):
         context={"request": request, "tools": optimizer.supported_tools}
     )
 
-@app.post("/api/optimize", response_model=OptimizeResponse)
-async def optimize_prompt(request: OptimizeRequest):
-    if not request.prompt:
-        raise HTTPException(status_code=400, detail="Prompt is required")
-    
-    if request.tool not in optimizer.supported_tools:
-        raise HTTPException(status_code=400, detail="Invalid tool selected")
+def use_local_optimizer(request: OptimizeRequest) -> bool:
+    """Route simple prompts (by the cheap local estimate) away from Gemini"""
+    mode = (request.mode or Config.OPTIMIZE_MODE).lower()
+    if mode == "local":
+        return True
+    if mode == "hybrid":
+        return estimate_complexity(request.prompt) <= Config.LOCAL_COMPLEXITY_THRESHOLD
+    return False
+
+def optimize_draft(request: OptimizeRequest) -> Dict[str, Any]:
+    """Deterministic rule-based optimization; runs in microseconds"""
+    analysis = analyze_locally(request.prompt)
+    optimized_prompt, optimizations = optimize_locally(
+        request.prompt, optimizer.supported_tools[request.tool], analysis
+    )
+    return {
+        "analysis": analysis,
+        "optimized_prompt": optimized_prompt,
+        "optimizations_made": optimizations,
+        "source": "local",
+    }
+
+async def optimize_with_llm(request: OptimizeRequest, http_request: Request) -> Dict[str, Any]:
+    """Gemini analysis + optimization through the shared cache, rate limit and scheduler"""
+    client = http_request.client.host if http_request.client else "unknown"
+    allowed, retry_after = True, 0
+    if Config.RATE_LIMIT_PER_MINUTE > 0:
+        allowed, retry_after = await run_in_threadpool(
+            store.hit_rate_limit, f"optimize:{client}", Config.RATE_LIMIT_PER_MINUTE
+        )
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(retry_after)},
+        )
     
-    # Analyze the prompt
-    analysis = optimizer.analyze_prompt_intent(request.prompt)
+    # Keyed on the tool's compiled prefix so edits to tools.json invalidate old entries
+    tool = optimizer.registry.get(request.tool) if isinstance(optimizer, PromptOptimizer) else None
+    tool_key = tool.prefix_key if tool else request.tool
+    cache_key = "optimize:" + hashlib.sha256(f"{tool_key}\0{request.prompt}".encode("utf-8")).hexdigest()
+    result = await run_in_threadpool(store.get, cache_key)
+    if result:
+        return result
     
-    # Optimize for the specific tool
-    optimized_prompt, optimizations = optimizer.optimize_for_tool(
-        request.prompt, request.tool, analysis
-    )
+    def run_optimization():
+        # Analyze the prompt
+        analysis = optimizer.analyze_prompt_intent(request.prompt)
+        
+        # Optimize for the specific tool
+        optimized_prompt, optimizations = optimizer.optimize_for_tool(
+            request.prompt, request.tool, analysis
+        )
+        result = {
+            "analysis": analysis,
+            "optimized_prompt": optimized_prompt,
+            "optimizations_made": optimizations,
+            "source": "gemini",
+        }
+        # Only cache real optimizations, not the unchanged prompt returned on errors
+        if optimized_prompt != request.prompt:
+            store.set(cache_key, result)
+        return result
     
+    priority = PRIORITIES.get(http_request.headers.get("X-Request-Priority", "").lower(), INTERACTIVE)
+    try:
+        return await scheduler.submit(
+            cache_key,
+            lambda: run_in_threadpool(run_optimization),
+            client=client,
+            priority=priority,
+            is_disconnected=http_request.is_disconnected,
+            deadline=time.monotonic() + Config.UPSTREAM_REQUEST_TIMEOUT,
+        )
+    except SchedulerOverloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except RequestDropped:
+        raise HTTPException(status_code=503, detail="Request expired before it could be processed")
+
+def build_response(request: OptimizeRequest, result: Dict[str, Any]) -> OptimizeResponse:
     return OptimizeResponse(
         original_prompt=request.prompt,
-        optimized_prompt=optimized_prompt,
+        optimized_prompt=result["optimized_prompt"],
         tool=optimizer.supported_tools[request.tool]['name'],
-        analysis=analysis,
-        optimizations_made=optimizations,
+        analysis=result["analysis"],
+        optimizations_made=result["optimizations_made"],
+        source=result.get("source", "gemini"),
         timestamp=datetime.now().isoformat()
     )
 
+def validate_optimize_request(request: OptimizeRequest):
+    if not request.prompt:
+        raise HTTPException(status_code=400, detail="Prompt is required")
+    
+    if request.tool not in optimizer.supported_tools:
+        raise HTTPException(status_code=400, detail="Invalid tool selected")
+    
+    if request.mode and request.mode.lower() not in OPTIMIZE_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode must be one of: {', '.join(OPTIMIZE_MODES)}")
+
+@app.post("/api/optimize", response_model=OptimizeResponse)
+async def optimize_prompt(request: OptimizeRequest, http_request: Request):
+    validate_optimize_request(request)
+    
+    if use_local_optimizer(request):
+        return build_response(request, optimize_draft(request))
+    
+    return build_response(request, await optimize_with_llm(request, http_request))
+
+@app.post("/api/optimize/stream")
+async def optimize_prompt_stream(request: OptimizeRequest, http_request: Request):
+    """Newline-delimited JSON: a local draft immediately, then the Gemini result.
+
+    Each line is an OptimizeResponse plus "stage" ("draft" or "final"); if
+    the Gemini call fails or returns the prompt unchanged after the draft
+    was sent, the last line is {"stage": "error", "status_code": ..., "detail": ...},
+    plus "retry_after" when the request was rejected with Retry-After.
+    """
+    validate_optimize_request(request)
+    draft = build_response(request, optimize_draft(request))
+    local_only = use_local_optimizer(request)
+    
+    async def events():
+        yield json.dumps({"stage": "final" if local_only else "draft", **draft.model_dump()}) + "\n"
+        if local_only:
+            return
+        try:
+            result = await optimize_with_llm(request, http_request)
+            # optimize_for_tool returns the prompt unchanged when Gemini fails; keep the draft
+            if result["optimized_prompt"] == request.prompt:
+                yield json.dumps({
+                    "stage": "error",
+                    "status_code": 502,
+                    "detail": "; ".join(result["optimizations_made"]) or "Gemini optimization failed",
+                }) + "\n"
+                return
+            final = build_response(request, result)
+            yield json.dumps({"stage": "final", **final.model_dump()}) + "\n"
+        except HTTPException as e:
+            error = {"stage": "error", "status_code": e.status_code, "detail": e.detail}
+            if e.headers and "Retry-After" in e.headers:
+                error["retry_after"] = e.headers["Retry-After"]
+            yield json.dumps(error) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.get("/api/tools")
 async def get_tools():
     return optimizer.supported_tools
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -10,11 +11,41 @@ class Config:
     # Gemini AI Configuration
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'your-api-key-here')
     
+    # Gemini context caching of the per-tool instruction prefix
+    GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'False').lower() == 'true'
+    GEMINI_CACHE_MODEL = os.getenv('GEMINI_CACHE_MODEL', 'models/gemini-2.0-flash-001')
+    GEMINI_CACHE_TTL_SECONDS = int(os.getenv('GEMINI_CACHE_TTL_SECONDS', 3600))
+    # Gemini rejects explicit caches below a per-model minimum size; shorter prefixes skip caching
+    GEMINI_CACHE_MIN_TOKENS = int(os.getenv('GEMINI_CACHE_MIN_TOKENS', 4096))
+    
+    # Tool registry (reloaded automatically when the file changes)
+    TOOLS_FILE = os.getenv('TOOLS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tools.json'))
+    TOOLS_RELOAD_INTERVAL = float(os.getenv('TOOLS_RELOAD_INTERVAL', 2.0))
+    
     # Server Configuration
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 8080))
     DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
     
+    # Production serving (see `python run.py --production`)
+    WORKERS = int(os.getenv('WORKERS', 0)) or (os.cpu_count() or 1)
+    GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv('GRACEFUL_SHUTDOWN_TIMEOUT', 60))
+    
+    # State shared between workers (SQLite WAL file on the local host)
+    SHARED_STORE_PATH = os.getenv('SHARED_STORE_PATH', os.path.join(tempfile.gettempdir(), 'prompt_optimizer_store.sqlite3'))
+    CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 3600))
+    RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', 0))  # 0 disables the limit
+    
+    # Upstream Gemini scheduling (per worker)
+    UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', 4))
+    UPSTREAM_LATENCY_BUDGET = float(os.getenv('UPSTREAM_LATENCY_BUDGET', 10.0))
+    UPSTREAM_REQUEST_TIMEOUT = float(os.getenv('UPSTREAM_REQUEST_TIMEOUT', 60.0))
+    
+    # Routing: "llm" always calls Gemini, "local" uses the rule-based optimizer,
+    # "hybrid" uses it for prompts at or below LOCAL_COMPLEXITY_THRESHOLD
+    OPTIMIZE_MODE = os.getenv('OPTIMIZE_MODE', 'llm').lower()
+    LOCAL_COMPLEXITY_THRESHOLD = int(os.getenv('LOCAL_COMPLEXITY_THRESHOLD', 2))
+    
     # Application Configuration
     APP_NAME = "Adaptive Prompt Optimizer"
     APP_VERSION = "1.0.0"
@@ -0,0 +1,170 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+# Technologies recognised in prompts, matched as whole words (lowercase -> display name).
+# Names that are ordinary English words too (react, rust, swift, rails, angular,
+# lambda, node, express, spring) only count with a qualifier.
+KNOWN_TECHNOLOGIES = {
+    "python": "Python", "javascript": "JavaScript", "typescript": "TypeScript",
+    "java": "Java", "golang": "Go", "c++": "C++", "c#": "C#",
+    "rustlang": "Rust", "rust code": "Rust", "rust crate": "Rust", "rust program": "Rust",
+    "ruby": "Ruby", "php": "PHP", "kotlin": "Kotlin",
+    "swiftui": "Swift", "swift code": "Swift", "swift app": "Swift", "ios swift": "Swift",
+    "sql": "SQL", "html": "HTML", "css": "CSS", "bash": "Bash",
+    "react.js": "React", "reactjs": "React", "react component": "React", "react app": "React",
+    "react hook": "React", "react native": "React",
+    "vue": "Vue", "vue.js": "Vue",
+    "angularjs": "Angular", "angular.js": "Angular", "angular component": "Angular", "angular app": "Angular",
+    "next.js": "Next.js",
+    "node.js": "Node.js", "nodejs": "Node.js", "express.js": "Express", "expressjs": "Express",
+    "django": "Django", "flask": "Flask", "fastapi": "FastAPI", "spring boot": "Spring Boot",
+    "ruby on rails": "Rails", "rails app": "Rails", "rails controller": "Rails", "rails model": "Rails",
+    "pandas": "pandas", "numpy": "NumPy",
+    "pytorch": "PyTorch", "tensorflow": "TensorFlow",
+    "aws": "AWS", "aws lambda": "AWS Lambda", "s3": "S3", "dynamodb": "DynamoDB",
+    "docker": "Docker", "kubernetes": "Kubernetes",
+    "postgres": "PostgreSQL", "postgresql": "PostgreSQL", "mysql": "MySQL",
+    "mongodb": "MongoDB", "redis": "Redis",
+}
+
+# A trailing "s" is allowed so qualifiers also match plurals ("react components")
+_TECHNOLOGY_PATTERN = re.compile(
+    r"(?<![\w.+#])("
+    + "|".join(re.escape(t) for t in sorted(KNOWN_TECHNOLOGIES, key=len, reverse=True))
+    + r")s?(?![\w+#])",
+    re.IGNORECASE,
+)
+
+# First matching keyword wins; order matters
+INTENT_KEYWORDS = [
+    ("debugging", ("fix", "bug", "error", "debug", "crash", "broken", "exception", "not working")),
+    ("refactoring", ("refactor", "clean up", "restructure", "rename", "simplify")),
+    ("optimization", ("optimize", "optimise", "faster", "performance", "speed up", "memory")),
+    ("explanation", ("explain", "what does", "why does", "how does", "understand")),
+]
+
+# Keywords match whole words plus simple inflections ("fixed", "bugs"), not "prefix"
+_INTENT_PATTERNS = [
+    (intent, re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")(?:s|es|d|ed|ing)?\b"))
+    for intent, keywords in INTENT_KEYWORDS
+]
+
+# Sentence ends (not the dot in "node.js"), semicolons and line breaks
+_SENTENCE_BOUNDARY = re.compile(r"[.!?](?:\s+|$)|[;\n]")
+
+# Markers of separate requirements within one prompt
+_REQUIREMENT_MARKERS = re.compile(r"\b(and|also|then|must|should|with|without|plus)\b|[,;]|\n\s*[-*\d]")
+
+# Rules keyed on phrases in a tool's best_practices:
+# (keywords, section, line to add, summary of the change)
+BEST_PRACTICE_RULES = [
+    (("type hint", "docstring"), "constraints",
+     "Add type hints and docstrings to all functions.", "Requested type hints and docstrings"),
+    (("descriptive function name", "naming convention"), "constraints",
+     "Use consistent, descriptive names for functions and variables.", "Asked for descriptive, consistent naming"),
+    (("current state and desired outcome",), "context",
+     "Current state: [describe what the code does now]", "Added a slot for the current state"),
+    (("file location", "specific files"), "context",
+     "Files: [list the files or functions involved]", "Added a slot for file locations"),
+    (("codebase",), "context",
+     "Codebase: [describe the relevant modules and structure]", "Added a slot for codebase context"),
+    (("team coding style", "patterns to follow", "related code patterns"), "constraints",
+     "Follow the existing code style and patterns in the project.", "Asked to follow existing patterns"),
+    (("project structure",), "context",
+     "Project structure: [outline the relevant directories]", "Added a slot for project structure"),
+    (("deployment",), "constraints",
+     "State the deployment target and any runtime requirements.", "Asked for deployment requirements"),
+    (("dependency", "dependencies", "imports"), "constraints",
+     "List the packages and imports the solution needs.", "Asked for required packages and imports"),
+    (("aws services",), "context",
+     "AWS services: [name the services involved, if any]", "Added a slot for AWS services"),
+    (("security",), "constraints",
+     "Validate inputs and avoid hard-coded secrets.", "Added security requirements"),
+    (("cloud architecture",), "constraints",
+     "Follow standard cloud architecture patterns.", "Asked for cloud architecture patterns"),
+    (("architectural constraints",), "constraints",
+     "Respect existing architectural constraints.", "Added architectural constraints"),
+    (("step-by-step",), "constraints",
+     "Explain the solution step by step.", "Asked for a step-by-step explanation"),
+    (("code review",), "constraints",
+     "Review the result and suggest improvements.", "Asked for a review of the result"),
+    (("specific about desired functionality", "actionable language", "precise technical terminology"), "constraints",
+     "Describe expected inputs, outputs and edge cases precisely.", "Made the expected behaviour explicit"),
+]
+
+_LANGUAGE_PRACTICES = ("programming language", "technologies/frameworks", "comprehensive context")
+
+
+def detect_technologies(prompt: str) -> List[str]:
+    """Technologies named in the prompt, in order of first mention"""
+    found = []
+    for match in _TECHNOLOGY_PATTERN.finditer(prompt):
+        name = KNOWN_TECHNOLOGIES[match.group(1).lower()]
+        if name not in found:
+            found.append(name)
+    return found
+
+
+def estimate_complexity(prompt: str) -> int:
+    """Cheap 1-5 complexity estimate from length, technologies and requirement count"""
+    words = len(prompt.split())
+    score = 1
+    score += (words > 15) + (words > 40) + (words > 100)
+    score += len(detect_technologies(prompt)) >= 2
+    score += len(_REQUIREMENT_MARKERS.findall(prompt.lower())) >= 4
+    return min(score, 5)
+
+
+def analyze_locally(prompt: str) -> Dict[str, Any]:
+    """Same shape as PromptOptimizer.analyze_prompt_intent, without calling Gemini"""
+    lowered = prompt.lower()
+    intent = next(
+        (name for name, pattern in _INTENT_PATTERNS if pattern.search(lowered)),
+        "code_generation",
+    )
+    technologies = detect_technologies(prompt)
+    missing = []
+    if not technologies:
+        missing.append("Programming language or framework")
+    if intent == "debugging" and not re.search(r"\berror", lowered):
+        missing.append("Exact error message or failing behaviour")
+    if len(prompt.split()) < 8:
+        missing.append("Expected inputs and outputs")
+    return {
+        "primary_intent": intent,
+        "complexity_level": estimate_complexity(prompt),
+        "key_requirements": [s.strip() for s in _SENTENCE_BOUNDARY.split(prompt) if s.strip()][:5],
+        "missing_context": missing,
+        "technical_domains": technologies or ["General programming"],
+    }
+
+
+def optimize_locally(prompt: str, tool_info: Dict[str, Any], analysis: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """Rewrite the prompt into goal/context/constraints using the tool's best practices"""
+    practices = " ".join(tool_info.get("best_practices", [])).lower()
+    technologies = [d for d in analysis.get("technical_domains", []) if d != "General programming"]
+    context: List[str] = []
+    constraints: List[str] = []
+    optimizations: List[str] = ["Structured the prompt into goal, context and constraints"]
+
+    if technologies:
+        context.append(f"Technologies: {', '.join(technologies)}")
+    elif any(p in practices for p in _LANGUAGE_PRACTICES) or "Programming language or framework" in analysis.get("missing_context", []):
+        context.append("Language/framework: [specify the language and framework]")
+        optimizations.append("Added a slot for the missing language/framework")
+
+    sections = {"context": context, "constraints": constraints}
+    for keywords, section, line, summary in BEST_PRACTICE_RULES:
+        if any(k in practices for k in keywords) and line not in sections[section]:
+            sections[section].append(line)
+            optimizations.append(f"{summary} ({tool_info.get('name', 'tool')} best practice)")
+
+    goal = prompt.strip()
+    if goal and goal[-1] not in ".?!":
+        goal += "."
+    lines = [f"Goal: {goal[:1].upper()}{goal[1:]}"]
+    if context:
+        lines += ["", "Context:"] + [f"- {c}" for c in context]
+    if constraints:
+        lines += ["", "Constraints:"] + [f"- {c}" for c in constraints]
+    return "\n".join(lines), optimizations
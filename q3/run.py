@@ -2,11 +2,14 @@
 """
 Adaptive Prompt Optimizer Runner
 Simple script to start the application with proper checks.
+
+Use `python run.py --production` to run multiple workers without reload.
 """
 
 import sys
 import subprocess
 import os
+import importlib.util
 
 def check_python_version():
     """Check if Python version is compatible."""
@@ -42,8 +45,22 @@ def check_gemini_api_key():
     print("✓ Gemini API key is configured")
     return True
 
+def production_options(config):
+    """uvicorn settings for production: one worker per CPU, no reload, fast loop/parser."""
+    return {
+        "workers": config.WORKERS,
+        "reload": False,
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        # On SIGTERM stop accepting connections and let in-flight Gemini calls finish
+        "timeout_graceful_shutdown": config.GRACEFUL_SHUTDOWN_TIMEOUT,
+        "proxy_headers": True,
+        "log_level": "info",
+    }
+
 def main():
     """Main function to run checks and start the application."""
+    production = "--production" in sys.argv[1:]
     print("🚀 Adaptive Prompt Optimizer - Starting...")
     print("=" * 50)
     
@@ -56,6 +73,8 @@ def main():
     
     if not check_gemini_api_key():
         print("\n⚠️  Warning: API key not set. The application will start but won't work properly.")
+        if production:
+            sys.exit(1)
         response = input("Continue anyway? (y/N): ")
         if response.lower() != 'y':
             sys.exit(1)
@@ -65,12 +84,18 @@ def main():
     
     # Start the application
     try:
-        from app import app
         from config import Config
         import uvicorn
         
         print(f"🌐 Open your browser to: http://localhost:{Config.PORT}")
-        uvicorn.run(app, host=Config.HOST, port=Config.PORT, reload=Config.DEBUG)
+        if production:
+            options = production_options(Config)
+            print(f"⚙️  Production mode: {options['workers']} workers, loop={options['loop']}, http={options['http']}")
+            # Workers need an import string so each process loads its own app
+            uvicorn.run("app:app", host=Config.HOST, port=Config.PORT, **options)
+        else:
+            from app import app
+            uvicorn.run(app, host=Config.HOST, port=Config.PORT, reload=Config.DEBUG)
     except KeyboardInterrupt:
         print("\n👋 Application stopped by user")
     except Exception as e:
@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+
+class SharedStore:
+    """Response cache and rate-limit counters shared by all workers on a host.
+
+    Backed by a SQLite database in WAL mode, so every uvicorn worker process
+    sees the same entries instead of keeping its own per-process dicts.
+    Calls block on SQLite, so call them from a threadpool, not the event
+    loop. A short lock timeout makes them fail open when workers contend.
+    """
+
+    def __init__(self, path: Optional[str] = None, default_ttl: int = 3600, lock_timeout: float = 0.25):
+        self.path = path or os.path.join(tempfile.gettempdir(), "llm_backend_store.sqlite3")
+        self.default_ttl = default_ttl
+        self.lock_timeout = lock_timeout
+        self._local = threading.local()
+        # Schema setup runs once at startup, when workers may race; wait longer for the lock here
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, window_start REAL NOT NULL, count INTEGER NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.lock_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key`, or None if missing or expired"""
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Shared store read error: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """Store a JSON-serializable value for `ttl` seconds"""
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            # Opportunistically drop expired rows so the file doesn't grow unbounded
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            print(f"Shared store write error: {e}")
+
+    def hit_rate_limit(self, key: str, limit: int, window: float = 60.0) -> Tuple[bool, int]:
+        """Count a request against `key`'s fixed window.
+
+        Returns (allowed, retry_after_seconds). A non-positive limit disables limiting.
+        """
+        if limit <= 0:
+            return True, 0
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT window_start, count FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[0] >= window:
+                window_start, count = now, 1
+            else:
+                window_start, count = row[0], row[1] + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, window_start, count) VALUES (?, ?, ?)",
+                (key, window_start, count),
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Fail open: a store problem shouldn't take the API down
+            print(f"Shared store rate-limit error: {e}")
+            return True, 0
+        if count > limit:
+            return False, max(1, int(window_start + window - now + 0.999))
+        return True, 0
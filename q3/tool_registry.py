@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+OPTIMIZATION_INSTRUCTIONS = """Create an optimized version of the user's prompt that:
+1. Leverages the tool's strengths
+2. Follows the tool's best practices
+3. Addresses missing context from the analysis
+4. Is more specific and actionable
+
+Provide:
+1. optimized_prompt: The improved prompt
+2. optimizations_made: List of specific changes and why they help
+
+Return as JSON only."""
+
+
+class CompiledTool:
+    """A tool entry plus its static optimization prompt prefix, built once per load"""
+
+    def __init__(self, tool_id: str, info: Dict[str, Any]):
+        self.tool_id = tool_id
+        self.info = info
+        self.prefix = (
+            f"You optimize coding prompts for {info['name']}.\n\n"
+            f"Tool Strengths: {', '.join(info['strengths'])}\n"
+            f"Best Practices: {', '.join(info['best_practices'])}\n\n"
+            f"{OPTIMIZATION_INSTRUCTIONS}"
+        )
+        # Identifies this exact prefix, so cached Gemini content can be reused or invalidated
+        self.prefix_key = hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:16]
+
+    def render(self, prompt: str, analysis: Dict[str, Any]) -> str:
+        """Assemble only the per-request part of the optimization prompt"""
+        return (
+            f'Original Prompt: "{prompt}"\n'
+            f"Intent Analysis: {json.dumps(analysis, separators=(',', ':'))}"
+        )
+
+    def full_prompt(self, prompt: str, analysis: Dict[str, Any]) -> str:
+        """Prefix and dynamic part together, for models without a system instruction"""
+        return f"{self.prefix}\n\n{self.render(prompt, analysis)}"
+
+
+def validate_tools(tools: Any):
+    """Raise ValueError unless `tools` maps tool ids to well-formed tool entries"""
+    if not isinstance(tools, dict):
+        raise ValueError(f"expected an object of tools, got {type(tools).__name__}")
+    for tool_id, info in tools.items():
+        if not isinstance(info, dict):
+            raise ValueError(f"tool '{tool_id}' must be an object")
+        if not isinstance(info.get("name"), str) or not info["name"]:
+            raise ValueError(f"tool '{tool_id}' needs a non-empty string 'name'")
+        for field in ("strengths", "best_practices"):
+            values = info.get(field)
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise ValueError(f"tool '{tool_id}' field '{field}' must be a list of strings")
+
+
+class ToolRegistry:
+    """Supported tools loaded from a JSON file, reloaded when the file changes"""
+
+    def __init__(self, path: str, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._tools: Dict[str, Dict[str, Any]] = {}
+        self._compiled: Dict[str, CompiledTool] = {}
+        self.reload()
+
+    def reload(self) -> bool:
+        """Re-read the tools file; keeps the previous tools if the new file is invalid"""
+        with self._lock:
+            mtime = None
+            try:
+                mtime = os.path.getmtime(self.path)
+                with open(self.path, "r", encoding="utf-8") as f:
+                    tools = json.load(f)
+                validate_tools(tools)
+                compiled = {tool_id: CompiledTool(tool_id, info) for tool_id, info in tools.items()}
+            except (OSError, ValueError) as e:
+                print(f"✗ Failed to load tools from {self.path}: {e}")
+                # Don't re-parse the same broken file until it changes again
+                if mtime is not None:
+                    self._mtime = mtime
+                return False
+            self._tools = tools
+            self._compiled = compiled
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+            print(f"✓ Loaded {len(tools)} tools from {os.path.basename(self.path)}")
+            return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    @property
+    def tools(self) -> Dict[str, Dict[str, Any]]:
+        self._maybe_reload()
+        return self._tools
+
+    def get(self, tool_id: str) -> Optional[CompiledTool]:
+        self._maybe_reload()
+        return self._compiled.get(tool_id)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Startup profile report for the backends.
+Imports each backend's app module in a fresh interpreter with `-X importtime`
+and prints the total import time plus the most expensive imports, so cold-start
+regressions show up before they reach the autoscaler.
+
+Usage:
+    python startup_profile.py                 # all backends
+    python startup_profile.py q3 --top 15     # one backend, more detail
+    python startup_profile.py --max-ms 800    # exit 1 if any backend is slower
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+BACKENDS = {
+    "q1": (os.path.join(ROOT, "q1_LLM_inference_calculator", "backend"), "main"),
+    "q2": (os.path.join(ROOT, "q2_coding_agent_recommend", "backend"), "main"),
+    "q3": (os.path.join(ROOT, "q3"), "app"),
+}
+
+
+def profile_imports(directory, module):
+    """Import `module` from `directory` and return ({name: (self_us, cumulative_us)}, error)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=directory,
+        capture_output=True,
+        text=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        # Format: "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    error = None
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"
+    return timings, error
+
+
+def report(name, timings, error, top):
+    """Print the import-time breakdown for one backend and return its total in ms."""
+    total_ms = sum(self_us for self_us, _ in timings.values()) / 1000
+    print(f"== {name}: {total_ms:.1f} ms total import time ({len(timings)} modules)")
+    if error:
+        print(f"   ! {error}")
+    # Top-level packages are what we can actually make lazy, so rank by those
+    packages = {
+        module: cumulative_us
+        for module, (_, cumulative_us) in timings.items()
+        if "." not in module
+    }
+    for package, cumulative_us in sorted(packages.items(), key=lambda x: x[1], reverse=True)[:top]:
+        print(f"   {cumulative_us / 1000:9.1f} ms  {package}")
+    return total_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown for each backend")
+    parser.add_argument("backends", nargs="*", help=f"Backends to profile: {', '.join(sorted(BACKENDS))} (default: all)")
+    parser.add_argument("--top", type=int, default=10, help="Number of packages to list per backend")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if a backend's import time exceeds this")
+    args = parser.parse_args()
+    unknown = [name for name in args.backends if name not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(unknown)}")
+
+    failed = False
+    for name in args.backends or sorted(BACKENDS):
+        directory, module = BACKENDS[name]
+        timings, error = profile_imports(directory, module)
+        total_ms = report(name, timings, error, args.top)
+        if args.max_ms is not None and total_ms > args.max_ms:
+            print(f"   ! exceeds budget of {args.max_ms:.0f} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()